@@ -15,5 +15,5 @@ from .embedding import (
 from .segmentation import SpeakerSegmentation
 from .diarization import SpeakerDiarization, SpeakerDiarizationConfig
 from .base import PipelineConfig, Pipeline
-from .utils import Binarize, Resample, AdjustVolume
+from .utils import Binarize, Resample, AdjustVolume, ChunkBatcher
 from .vad import VoiceActivityDetection, VoiceActivityDetectionConfig
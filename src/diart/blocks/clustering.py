@@ -146,6 +146,10 @@ class OnlineSpeakerClustering:
 
         num_local_speakers = segmentation.data.shape[1]
 
+        # Convert speaker indices once for constant-time membership checks
+        active_speaker_set = set(active_speakers.tolist())
+        long_speaker_set = set(long_speakers.tolist())
+
         if self.centers is None:
             self.init_centers(embeddings.shape[1])
             assignments = [
@@ -161,7 +165,7 @@ class OnlineSpeakerClustering:
         dist_map = SpeakerMapBuilder.dist(embeddings, self.centers, self.metric)
         # Remove any assignments containing invalid speakers
         inactive_speakers = np.array(
-            [spk for spk in range(num_local_speakers) if spk not in active_speakers]
+            [spk for spk in range(num_local_speakers) if spk not in active_speaker_set]
         )
         dist_map = dist_map.unmap_speakers(inactive_speakers, self.inactive_centers)
         # Keep assignments under the distance threshold
@@ -176,7 +180,7 @@ class OnlineSpeakerClustering:
         new_center_speakers = []
         for spk in missed_speakers:
             has_space = len(new_center_speakers) < self.num_free_centers
-            if has_space and spk in long_speakers:
+            if has_space and spk in long_speaker_set:
                 # Flag as a new center
                 new_center_speakers.append(spk)
             else:
@@ -194,10 +198,11 @@ class OnlineSpeakerClustering:
                     valid_map = valid_map.set_source_speaker(spk, free[0])
 
         # Update known centers
+        missed_speaker_set = set(missed_speakers)
         to_update = [
             (ls, gs)
             for ls, gs in zip(*valid_map.valid_assignments())
-            if ls not in missed_speakers and ls in long_speakers
+            if ls not in missed_speaker_set and ls in long_speaker_set
         ]
         self.update(to_update, embeddings)
 
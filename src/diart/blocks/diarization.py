@@ -1,10 +1,11 @@
 from __future__ import annotations
 
+from collections import deque
 from typing import Sequence
 
 import numpy as np
 import torch
-from pyannote.core import Annotation, SlidingWindowFeature, SlidingWindow, Segment
+from pyannote.core import Annotation, SlidingWindowFeature, SlidingWindow
 from pyannote.metrics.base import BaseMetric
 from pyannote.metrics.diarization import DiarizationErrorRate
 from typing_extensions import Literal
@@ -14,7 +15,7 @@ from .aggregation import DelayedAggregation
 from .clustering import OnlineSpeakerClustering
 from .embedding import OverlapAwareSpeakerEmbedding
 from .segmentation import SpeakerSegmentation
-from .utils import Binarize
+from .utils import Binarize, ChunkBatcher
 from .. import models as m
 
 
@@ -93,6 +94,10 @@ class SpeakerDiarization(base.Pipeline):
         msg = f"Latency should be in the range [{self._config.step}, {self._config.duration}]"
         assert self._config.step <= self._config.latency <= self._config.duration, msg
 
+        self._expected_num_samples = int(
+            np.rint(self._config.duration * self._config.sample_rate)
+        )
+
         self.segmentation = SpeakerSegmentation(
             self._config.segmentation, self._config.device
         )
@@ -117,11 +122,12 @@ class SpeakerDiarization(base.Pipeline):
             cropping_mode="center",
         )
         self.binarize = Binarize(self._config.tau_active)
+        self.batcher = ChunkBatcher(self._config.device)
 
         # Internal state, handle with care
         self.timestamp_shift = 0
         self.clustering = None
-        self.chunk_buffer, self.pred_buffer = [], []
+        self.chunk_buffer, self.pred_buffer = self._new_buffers()
         self.reset()
 
     @staticmethod
@@ -140,6 +146,11 @@ class SpeakerDiarization(base.Pipeline):
     def config(self) -> SpeakerDiarizationConfig:
         return self._config
 
+    def _new_buffers(self) -> tuple[deque, deque]:
+        # Buffers drop their oldest chunk to make place for new ones
+        max_chunks = self.pred_aggregation.num_overlapping_windows
+        return deque(maxlen=max_chunks), deque(maxlen=max_chunks)
+
     def set_timestamp_shift(self, shift: float):
         self.timestamp_shift = shift
 
@@ -152,8 +163,9 @@ class SpeakerDiarization(base.Pipeline):
             "cosine",
             self.config.max_speakers,
         )
-        self.chunk_buffer, self.pred_buffer = [], []
+        self.chunk_buffer, self.pred_buffer = self._new_buffers()
 
+    @torch.inference_mode()
     def __call__(
         self, waveforms: Sequence[SlidingWindowFeature]
     ) -> Sequence[tuple[Annotation, SlidingWindowFeature]]:
@@ -174,11 +186,9 @@ class SpeakerDiarization(base.Pipeline):
         assert batch_size >= 1, msg
 
         # Create batch from chunk sequence, shape (batch, samples, channels)
-        batch = torch.stack([torch.from_numpy(w.data) for w in waveforms])
+        batch = self.batcher(waveforms)
 
-        expected_num_samples = int(
-            np.rint(self.config.duration * self.config.sample_rate)
-        )
+        expected_num_samples = self._expected_num_samples
         msg = f"Expected {expected_num_samples} samples per chunk, but got {batch.shape[1]}"
         assert batch.shape[1] == expected_num_samples, msg
 
@@ -189,6 +199,9 @@ class SpeakerDiarization(base.Pipeline):
 
         seg_resolution = waveforms[0].extent.duration / segmentations.shape[1]
 
+        # Move scores to numpy once for the whole batch
+        segmentations = segmentations.cpu().numpy()
+
         outputs = []
         for wav, seg, emb in zip(waveforms, segmentations, embeddings):
             # Add timestamps to segmentation
@@ -197,7 +210,7 @@ class SpeakerDiarization(base.Pipeline):
                 duration=seg_resolution,
                 step=seg_resolution,
             )
-            seg = SlidingWindowFeature(seg.cpu().numpy(), sw)
+            seg = SlidingWindowFeature(seg, sw)
 
             # Update clustering state and permute segmentation
             permuted_seg = self.clustering(seg, emb)
@@ -209,26 +222,9 @@ class SpeakerDiarization(base.Pipeline):
             # Aggregate buffer outputs for this time step
             agg_waveform = self.audio_aggregation(self.chunk_buffer)
             agg_prediction = self.pred_aggregation(self.pred_buffer)
-            agg_prediction = self.binarize(agg_prediction)
-
-            # Shift prediction timestamps if required
-            if self.timestamp_shift != 0:
-                shifted_agg_prediction = Annotation(agg_prediction.uri)
-                for segment, track, speaker in agg_prediction.itertracks(
-                    yield_label=True
-                ):
-                    new_segment = Segment(
-                        segment.start + self.timestamp_shift,
-                        segment.end + self.timestamp_shift,
-                    )
-                    shifted_agg_prediction[new_segment, track] = speaker
-                agg_prediction = shifted_agg_prediction
+            # Binarize and shift prediction timestamps if required
+            agg_prediction = self.binarize(agg_prediction, self.timestamp_shift)
 
             outputs.append((agg_prediction, agg_waveform))
 
-            # Make place for new chunks in buffer if required
-            if len(self.chunk_buffer) == self.pred_aggregation.num_overlapping_windows:
-                self.chunk_buffer = self.chunk_buffer[1:]
-                self.pred_buffer = self.pred_buffer[1:]
-
         return outputs
@@ -1,10 +1,11 @@
-from typing import Text, Optional
+from typing import Text, Optional, Sequence
 
 import numpy as np
 import torch
 from pyannote.core import Annotation, Segment, SlidingWindowFeature
 import torchaudio.transforms as T
 
+from .. import utils
 from ..features import TemporalFeatures, TemporalFeatureFormatter
 
 
@@ -25,7 +26,9 @@ class Binarize:
         self.uri = uri
         self.threshold = threshold
 
-    def __call__(self, segmentation: SlidingWindowFeature) -> Annotation:
+    def __call__(
+        self, segmentation: SlidingWindowFeature, shift: float = 0
+    ) -> Annotation:
         """
         Return the continuous-time segmentation
         corresponding to the discrete-time input segmentation.
@@ -34,31 +37,92 @@ class Binarize:
         ----------
         segmentation: SlidingWindowFeature
             Discrete-time speaker segmentation.
+        shift: float, optional
+            Time (in seconds) to add to every speaker turn. Defaults to 0.
 
         Returns
         -------
         annotation: Annotation
             Continuous-time speaker segmentation.
         """
-        num_frames, num_speakers = segmentation.data.shape
         timestamps = segmentation.sliding_window
         is_active = segmentation.data > self.threshold
-        # Artificially add last inactive frame to close any remaining speaker turns
-        is_active = np.append(is_active, [[False] * num_speakers], axis=0)
-        start_times = np.zeros(num_speakers) + timestamps[0].middle
+        # Artificially add inactive frames at both ends to open and close
+        # any speaker turn at the beginning and the end of the chunk.
+        # A turn change is then any nonzero difference between consecutive frames
+        is_active = np.pad(is_active, ((1, 1), (0, 0))).astype(np.int8)
+        changes = np.diff(is_active, axis=0).T  # shape (speakers, frames + 1)
+        # Any (False, True) starts a speaker turn at the "True" index
+        speakers, onsets = np.nonzero(changes == 1)
+        # Any (True, False) ends a speaker turn at the "False" index
+        _, offsets = np.nonzero(changes == -1)
+        # Compute frame middles as in SlidingWindow.__getitem__ and Segment.middle
+        start_times = timestamps.start + onsets * timestamps.step
+        start_times = 0.5 * (start_times + (start_times + timestamps.duration))
+        end_times = timestamps.start + offsets * timestamps.step
+        end_times = 0.5 * (end_times + (end_times + timestamps.duration))
+        # Shift all timestamps at once
+        start_times, end_times = start_times + shift, end_times + shift
         annotation = Annotation(uri=self.uri, modality="speech")
-        for t in range(num_frames):
-            # Any (False, True) starts a speaker turn at "True" index
-            onsets = np.logical_and(np.logical_not(is_active[t]), is_active[t + 1])
-            start_times[onsets] = timestamps[t + 1].middle
-            # Any (True, False) ends a speaker turn at "False" index
-            offsets = np.logical_and(is_active[t], np.logical_not(is_active[t + 1]))
-            for spk in np.where(offsets)[0]:
-                region = Segment(start_times[spk], timestamps[t + 1].middle)
-                annotation[region, spk] = f"speaker{spk}"
+        for spk, start, end in zip(
+            speakers.tolist(), start_times.tolist(), end_times.tolist()
+        ):
+            annotation[Segment(start, end), spk] = f"speaker{spk}"
         return annotation
 
 
+class ChunkBatcher:
+    """Stack consecutive audio chunks into a single batch tensor.
+
+    On CPU, chunks that are views of the same buffer are batched without copying.
+    Otherwise, the host buffer is allocated once and reused across calls as long as
+    the batch shape doesn't change. When the target device is a GPU,
+    the buffer lives in pinned memory so the host-to-device copy is asynchronous.
+    Because of this, CPU batches are only valid until the next call.
+
+    Parameters
+    ----------
+    device: Optional[torch.device]
+        Device where batches are sent. Defaults to CPU.
+    """
+
+    def __init__(self, device: Optional[torch.device] = None):
+        self.device = device
+        if self.device is None:
+            self.device = torch.device("cpu")
+        self._buffer: Optional[torch.Tensor] = None
+
+    def __call__(self, waveforms: Sequence[SlidingWindowFeature]) -> torch.Tensor:
+        """
+        Parameters
+        ----------
+        waveforms: Sequence[SlidingWindowFeature], shapes (samples, channels)
+            Audio chunks of the same shape.
+
+        Returns
+        -------
+        batch: torch.Tensor, shape (batch, samples, channels)
+            On CPU, this is either the reused buffer or a view of the chunks' memory,
+            so it's only valid until the next call and must not be modified.
+            Clone it if it needs to be kept.
+        """
+        if self.device.type == "cpu":
+            batch = utils.try_contiguous_batch(waveforms)
+            if batch is not None and batch.dtype == np.float32:
+                return torch.from_numpy(batch)
+
+        num_samples, num_channels = waveforms[0].data.shape
+        shape = (len(waveforms), num_samples, num_channels)
+        if self._buffer is None or tuple(self._buffer.shape) != shape:
+            self._buffer = torch.empty(
+                shape,
+                dtype=torch.float32,
+                pin_memory=self.device.type == "cuda",
+            )
+        np.stack([w.data for w in waveforms], out=self._buffer.numpy())
+        return self._buffer.to(self.device, non_blocking=True)
+
+
 class Resample:
     """Dynamically resample audio chunks.
 
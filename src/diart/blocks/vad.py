@@ -1,16 +1,12 @@
 from __future__ import annotations
 
+from collections import deque
+from pathlib import Path
 from typing import Sequence
 
 import numpy as np
 import torch
-from pyannote.core import (
-    Annotation,
-    Timeline,
-    SlidingWindowFeature,
-    SlidingWindow,
-    Segment,
-)
+from pyannote.core import Annotation, SlidingWindowFeature, SlidingWindow
 from pyannote.metrics.base import BaseMetric
 from pyannote.metrics.detection import DetectionErrorRate
 from typing_extensions import Literal
@@ -18,7 +14,7 @@ from typing_extensions import Literal
 from . import base
 from .aggregation import DelayedAggregation
 from .segmentation import SpeakerSegmentation
-from .utils import Binarize
+from .utils import Binarize, ChunkBatcher
 from .. import models as m
 from .. import utils
 
@@ -33,6 +29,11 @@ class VoiceActivityDetectionConfig(base.PipelineConfig):
         tau_active: float = 0.6,
         device: torch.device | None = None,
         sample_rate: int = 16000,
+        compile: bool = False,
+        backend: Literal["torch", "onnx"] = "torch",
+        onnx_path: str | Path | None = None,
+        cuda_graph: bool = False,
+        autocast: bool = False,
         **kwargs,
     ):
         # Default segmentation model is pyannote/segmentation
@@ -55,6 +56,30 @@ class VoiceActivityDetectionConfig(base.PipelineConfig):
         self.device = device or torch.device(
             "cuda" if torch.cuda.is_available() else "cpu"
         )
+        self.compile = compile
+        assert backend in ("torch", "onnx"), f"Invalid backend `{backend}`"
+        self.backend = backend
+        # Compiling in "reduce-overhead" mode already relies on CUDA graphs
+        msg = "CUDA graphs are only available for uncompiled pytorch models"
+        assert not cuda_graph or (backend == "torch" and not compile), msg
+        self.cuda_graph = cuda_graph
+        self.autocast = autocast
+        # A shared batcher runs the model on another thread and can't be exported
+        if isinstance(self.segmentation, m.DynamicBatcher):
+            msg = "DynamicBatcher models can't use compile, ONNX or CUDA graphs"
+            assert backend == "torch" and not compile and not cuda_graph, msg
+
+        # Export the segmentation model once so that all pipelines
+        # and configurations built from this one (e.g. when tuning) share it.
+        # Models that are already in ONNX format are kept as is
+        self.onnx_path = onnx_path
+        if self.backend == "onnx":
+            self.segmentation.load()
+            is_onnx = isinstance(self.segmentation.model, m.ONNXModel)
+            msg = "An `onnx_path` is required to export the segmentation model"
+            assert is_onnx or self.onnx_path is not None, msg
+            num_samples = int(np.rint(self._duration * self._sample_rate))
+            self.segmentation = self.segmentation.to_onnx(self.onnx_path, num_samples)
 
     @property
     def duration(self) -> float:
@@ -80,9 +105,14 @@ class VoiceActivityDetection(base.Pipeline):
         msg = f"Latency should be in the range [{self._config.step}, {self._config.duration}]"
         assert self._config.step <= self._config.latency <= self._config.duration, msg
 
-        self.segmentation = SpeakerSegmentation(
-            self._config.segmentation, self._config.device
+        self._expected_num_samples = int(
+            np.rint(self._config.duration * self._config.sample_rate)
         )
+
+        segmentation = self._config.segmentation
+        if self._config.cuda_graph and self._config.device.type == "cuda":
+            segmentation = m.CUDAGraphModel(segmentation)
+        self.segmentation = SpeakerSegmentation(segmentation, self._config.device)
         self.pred_aggregation = DelayedAggregation(
             self._config.step,
             self._config.latency,
@@ -96,10 +126,27 @@ class VoiceActivityDetection(base.Pipeline):
             cropping_mode="center",
         )
         self.binarize = Binarize(self._config.tau_active)
+        self.batcher = ChunkBatcher(self._config.device)
+
+        # Segmentation scores are only thresholded, so half precision can be enough
+        # on GPU. However, scores lose resolution and tuned thresholds may shift
+        self.use_autocast = self._config.autocast and self._config.device.type == "cuda"
+        self.autocast_dtype = torch.float16
+        if self.use_autocast and torch.cuda.is_bf16_supported():
+            self.autocast_dtype = torch.bfloat16
+
+        if self._config.compile:
+            self.segmentation.model.compile(mode="reduce-overhead")
+
+        if self._config.compile or self._config.cuda_graph:
+            # Run a first forward pass so the first chunk
+            # doesn't pay for compilation or graph capture
+            with torch.inference_mode():
+                self._segment(torch.zeros(1, self._expected_num_samples, 1))
 
         # Internal state, handle with care
         self.timestamp_shift = 0
-        self.chunk_buffer, self.pred_buffer = [], []
+        self.chunk_buffer, self.pred_buffer, self.voice_buffer = self._new_buffers()
 
     @staticmethod
     def get_config_class() -> type:
@@ -119,11 +166,32 @@ class VoiceActivityDetection(base.Pipeline):
 
     def reset(self):
         self.set_timestamp_shift(0)
-        self.chunk_buffer, self.pred_buffer = [], []
+        self.chunk_buffer, self.pred_buffer, self.voice_buffer = self._new_buffers()
+
+    def _new_buffers(self) -> tuple[deque, deque, deque]:
+        # Buffers drop their oldest chunk to make place for new ones
+        max_chunks = self.pred_aggregation.num_overlapping_windows
+        return (
+            deque(maxlen=max_chunks),
+            deque(maxlen=max_chunks),
+            deque(maxlen=max_chunks),
+        )
 
     def set_timestamp_shift(self, shift: float):
         self.timestamp_shift = shift
 
+    def _segment(self, batch: torch.Tensor) -> torch.Tensor:
+        # Autocast caching must be disabled to capture CUDA graphs
+        with torch.autocast(
+            device_type="cuda",
+            dtype=self.autocast_dtype,
+            enabled=self.use_autocast,
+            cache_enabled=False,
+        ):
+            # shape (batch, frames, speakers)
+            return self.segmentation(batch)
+
+    @torch.inference_mode()
     def __call__(
         self,
         waveforms: Sequence[SlidingWindowFeature],
@@ -133,59 +201,54 @@ class VoiceActivityDetection(base.Pipeline):
         assert batch_size >= 1, msg
 
         # Create batch from chunk sequence, shape (batch, samples, channels)
-        batch = torch.stack([torch.from_numpy(w.data) for w in waveforms])
+        batch = self.batcher(waveforms)
 
-        expected_num_samples = int(
-            np.rint(self.config.duration * self.config.sample_rate)
-        )
+        expected_num_samples = self._expected_num_samples
         msg = f"Expected {expected_num_samples} samples per chunk, but got {batch.shape[1]}"
         assert batch.shape[1] == expected_num_samples, msg
 
-        # Extract segmentation
-        segmentations = self.segmentation(batch)  # shape (batch, frames, speakers)
-        voice_detection = torch.max(segmentations, dim=-1, keepdim=True)[
-            0
-        ]  # shape (batch, frames, 1)
+        # Extract segmentation, shape (batch, frames, speakers)
+        segmentations = self._segment(batch)
+        # Move scores to numpy once for the whole batch, shape (batch, frames, 1)
+        voice_detection = segmentations.amax(dim=-1, keepdim=True).float()
+        voice_detection = voice_detection.cpu().numpy()
+        # Flag chunks that may contain speech, shape (batch,)
+        tau_active = self.config.tau_active
+        has_voice = (voice_detection.max(axis=(1, 2)) >= tau_active).tolist()
 
         seg_resolution = waveforms[0].extent.duration / segmentations.shape[1]
 
         outputs = []
-        for wav, vad in zip(waveforms, voice_detection):
+        for wav, vad, chunk_has_voice in zip(waveforms, voice_detection, has_voice):
             # Add timestamps to segmentation
             sw = SlidingWindow(
                 start=wav.extent.start,
                 duration=seg_resolution,
                 step=seg_resolution,
             )
-            vad = SlidingWindowFeature(vad.cpu().numpy(), sw)
+            vad = SlidingWindowFeature(vad, sw)
 
             # Update sliding buffer
             self.chunk_buffer.append(wav)
             self.pred_buffer.append(vad)
+            self.voice_buffer.append(chunk_has_voice)
 
             # Aggregate buffer outputs for this time step
             agg_waveform = self.audio_aggregation(self.chunk_buffer)
+
+            # A weighted average of scores below the threshold is also below it,
+            # so skip aggregation and binarization if no buffered chunk has speech
+            if not any(self.voice_buffer):
+                outputs.append((Annotation(uri=self.binarize.uri), agg_waveform))
+                continue
+
             agg_prediction = self.pred_aggregation(self.pred_buffer)
-            agg_prediction = self.binarize(agg_prediction).get_timeline(copy=False)
-
-            # Shift prediction timestamps if required
-            if self.timestamp_shift != 0:
-                shifted_agg_prediction = Timeline(uri=agg_prediction.uri)
-                for segment in agg_prediction:
-                    new_segment = Segment(
-                        segment.start + self.timestamp_shift,
-                        segment.end + self.timestamp_shift,
-                    )
-                    shifted_agg_prediction.add(new_segment)
-                agg_prediction = shifted_agg_prediction
+            # Binarize and shift prediction timestamps if required
+            agg_prediction = self.binarize(agg_prediction, self.timestamp_shift)
+            agg_prediction = agg_prediction.get_timeline(copy=False)
 
             # Convert timeline into annotation with single speaker "speech"
             agg_prediction = agg_prediction.to_annotation(utils.repeat_label("speech"))
             outputs.append((agg_prediction, agg_waveform))
 
-            # Make place for new chunks in buffer if required
-            if len(self.chunk_buffer) == self.pred_aggregation.num_overlapping_windows:
-                self.chunk_buffer = self.chunk_buffer[1:]
-                self.pred_buffer = self.pred_buffer[1:]
-
         return outputs
@@ -1,8 +1,14 @@
 from __future__ import annotations
 
+import copy
+import inspect
+import queue
+import threading
+import time
 from abc import ABC
+from concurrent.futures import Future
 from pathlib import Path
-from typing import Optional, Text, Union, Callable, List
+from typing import Optional, Text, Union, Callable, List, Tuple
 
 import numpy as np
 import torch
@@ -100,7 +106,32 @@ class ONNXModel:
             self.recreate_session()
         return self
 
+    def _run_with_io_binding(self, *args) -> np.ndarray:
+        # Bind inputs to their GPU memory to avoid copying them to the host
+        binding = self.session.io_binding()
+        args = [arg.contiguous().float() for arg in args]
+        for name, arg in zip(self.input_names, args):
+            binding.bind_input(
+                name=name,
+                device_type="cuda",
+                device_id=arg.device.index or 0,
+                element_type=np.float32,
+                shape=tuple(arg.shape),
+                buffer_ptr=arg.data_ptr(),
+            )
+        # Outputs are small and consumed on the host, so they're bound there
+        binding.bind_output(self.output_name, "cpu")
+        # ONNX runtime runs on its own stream, so pending copies
+        # of the inputs (e.g. non-blocking ones) need to finish first
+        for arg in args:
+            torch.cuda.current_stream(arg.device).synchronize()
+        self.session.run_with_iobinding(binding)
+        return binding.copy_outputs_to_cpu()[0]
+
     def __call__(self, *args) -> torch.Tensor:
+        if self.device.type == "cuda" and all(arg.is_cuda for arg in args):
+            # The output is left on the host, where callers move it anyway
+            return torch.from_numpy(self._run_with_io_binding(*args)).float()
         inputs = {
             name: arg.cpu().numpy().astype(np.float32)
             for name, arg in zip(self.input_names, args)
@@ -138,6 +169,246 @@ class LazyModel(ABC):
             self.model.eval()
         return self
 
+    def compile(self, **kwargs) -> LazyModel:
+        """Compile the model with `torch.compile` if it's a pytorch module.
+        Other models (e.g. ONNX) and pytorch versions without `torch.compile` are left as is.
+        Keyword arguments are passed to `torch.compile`.
+        """
+        self.load()
+        # Compiled modules keep a reference to the original one in `_orig_mod`
+        is_compiled = hasattr(self.model, "_orig_mod")
+        can_compile = isinstance(self.model, nn.Module) and hasattr(torch, "compile")
+        if can_compile and not is_compiled:
+            self.model = torch.compile(self.model, **kwargs)
+        return self
+
+
+# Whether CUDA autocast is enabled and its data type
+AutocastState = Tuple[bool, torch.dtype]
+
+
+def _get_autocast_state() -> AutocastState:
+    if hasattr(torch, "get_autocast_dtype"):
+        dtype = torch.get_autocast_dtype("cuda")
+    else:
+        # torch < 2.4
+        dtype = torch.get_autocast_gpu_dtype()
+    return torch.is_autocast_enabled(), dtype
+
+
+class DynamicBatcher:
+    """
+    Coalesce concurrent calls to a model into a single batched forward pass.
+
+    This is useful when several streams share the same model, for example when
+    serving one pipeline per client with `config.segmentation` set to a shared
+    `DynamicBatcher`. Each call blocks until its inputs have been processed
+    together with any other inputs received in the next `max_delay` seconds.
+
+    Parameters
+    ----------
+    model: Callable[[torch.Tensor], torch.Tensor]
+        Model taking a tensor of shape (batch, ...), e.g. a `SegmentationModel`.
+    max_delay: float
+        Maximum time (in seconds) to wait for other inputs before running the model.
+        Defaults to 0.01.
+    max_batch_size: Optional[int]
+        Maximum number of inputs per forward pass. Defaults to no limit.
+    """
+
+    def __init__(
+        self,
+        model: Callable[[torch.Tensor], torch.Tensor],
+        max_delay: float = 0.01,
+        max_batch_size: Optional[int] = None,
+    ):
+        self.model = model
+        self.max_delay = max_delay
+        self.max_batch_size = max_batch_size
+        self._requests: queue.Queue[
+            Optional[Tuple[torch.Tensor, AutocastState, Future]]
+        ] = queue.Queue()
+        self._carried_request: Optional[
+            Tuple[torch.Tensor, AutocastState, Future]
+        ] = None
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def to(self, device: torch.device) -> DynamicBatcher:
+        self.model = self.model.to(device)
+        return self
+
+    def eval(self) -> DynamicBatcher:
+        self.model = self.model.eval()
+        return self
+
+    def close(self):
+        """Stop the worker thread after processing pending requests.
+        A new worker is started if the batcher is called again.
+        """
+        with self._lock:
+            if self._worker is not None:
+                # None signals the worker to stop
+                self._requests.put(None)
+                self._worker.join()
+                self._worker = None
+
+    def _next_requests(self) -> List[Tuple[torch.Tensor, AutocastState, Future]]:
+        # Wait for a first request, then gather others until the deadline
+        if self._carried_request is not None:
+            requests = [self._carried_request]
+            self._carried_request = None
+        else:
+            requests = [self._requests.get()]
+            if requests[0] is None:
+                return []
+        first_inputs, autocast_state, _ = requests[0]
+        batch_size = first_inputs.shape[0]
+        deadline = time.monotonic() + self.max_delay
+        while self.max_batch_size is None or batch_size < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                request = self._requests.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if request is None:
+                # Stop after this batch
+                self._requests.put(None)
+                break
+            # Requests that can't be batched with the first one go to the next batch
+            inputs, request_autocast_state, _ = request
+            same_autocast = request_autocast_state == autocast_state
+            if not same_autocast or not self._can_batch(first_inputs, inputs):
+                self._carried_request = request
+                break
+            requests.append(request)
+            batch_size += request[0].shape[0]
+        return requests
+
+    @staticmethod
+    def _can_batch(inputs1: torch.Tensor, inputs2: torch.Tensor) -> bool:
+        return (
+            inputs1.shape[1:] == inputs2.shape[1:]
+            and inputs1.device == inputs2.device
+            and inputs1.dtype == inputs2.dtype
+        )
+
+    def _run(self):
+        while True:
+            requests = self._next_requests()
+            if not requests:
+                return
+            inputs = [x for x, _, _ in requests]
+            autocast_enabled, autocast_dtype = requests[0][1]
+            try:
+                # Grad mode and autocast are thread-local, so they're set again here
+                with torch.inference_mode(), torch.autocast(
+                    device_type="cuda", dtype=autocast_dtype, enabled=autocast_enabled
+                ):
+                    outputs = self.model(torch.cat(inputs))
+                sizes = [x.shape[0] for x in inputs]
+                for (_, _, future), output in zip(requests, outputs.split(sizes)):
+                    future.set_result(output)
+            except Exception as error:
+                for _, _, future in requests:
+                    future.set_exception(error)
+
+    def __call__(self, inputs: torch.Tensor) -> torch.Tensor:
+        """
+        Run the model on `inputs` together with other concurrent requests.
+        The model runs in inference mode and with the CUDA autocast setting of the caller.
+
+        Parameters
+        ----------
+        inputs: torch.Tensor, shape (batch, ...)
+
+        Returns
+        -------
+        outputs: torch.Tensor, shape (batch, ...)
+            Model outputs corresponding to `inputs` only.
+        """
+        future = Future()
+        autocast_state = _get_autocast_state()
+        # Start the worker and enqueue atomically so `close()` can't drop the request
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+            self._requests.put((inputs, autocast_state, future))
+        return future.result()
+
+
+class CUDAGraphModel:
+    """
+    Replay CUDA graphs of a pytorch model instead of launching its kernels one by one.
+
+    A graph is captured the first time the model is called with a given input shape,
+    and replayed for every later call with the same shape.
+    This only pays off for models called many times on fixed-size inputs,
+    like a segmentation model in a streaming pipeline.
+    Inputs that are not on a CUDA device are passed to the model as is.
+    Graphs are captured and replayed in inference mode.
+
+    Parameters
+    ----------
+    model: Callable[[torch.Tensor], torch.Tensor]
+        Pytorch model to capture, e.g. a `SegmentationModel` loaded from pyannote.
+    num_warmup_steps: int
+        Number of forward passes before capturing a graph. Defaults to 3.
+    """
+
+    def __init__(
+        self,
+        model: Callable[[torch.Tensor], torch.Tensor],
+        num_warmup_steps: int = 3,
+    ):
+        self.model = model
+        self.num_warmup_steps = num_warmup_steps
+        # Maps an input shape to its graph, static input and static output
+        self._graphs = {}
+
+    def to(self, device: torch.device) -> CUDAGraphModel:
+        self.model = self.model.to(device)
+        self._graphs = {}
+        return self
+
+    def eval(self) -> CUDAGraphModel:
+        self.model = self.model.eval()
+        return self
+
+    def _capture(
+        self, inputs: torch.Tensor
+    ) -> Tuple[torch.cuda.CUDAGraph, torch.Tensor, torch.Tensor]:
+        static_inputs = inputs.clone()
+        # Warm up on a side stream as required before capture
+        stream = torch.cuda.Stream()
+        stream.wait_stream(torch.cuda.current_stream())
+        with torch.cuda.stream(stream):
+            for _ in range(self.num_warmup_steps):
+                self.model(static_inputs)
+        torch.cuda.current_stream().wait_stream(stream)
+        graph = torch.cuda.CUDAGraph()
+        with torch.cuda.graph(graph):
+            static_outputs = self.model(static_inputs)
+        return graph, static_inputs, static_outputs
+
+    def __call__(self, inputs: torch.Tensor) -> torch.Tensor:
+        if not inputs.is_cuda:
+            return self.model(inputs)
+        # Static tensors are always created and updated in inference mode,
+        # whatever the grad mode of the caller
+        with torch.inference_mode():
+            shape = tuple(inputs.shape)
+            if shape not in self._graphs:
+                self._graphs[shape] = self._capture(inputs)
+            graph, static_inputs, static_outputs = self._graphs[shape]
+            static_inputs.copy_(inputs)
+            graph.replay()
+            # Outputs are overwritten by the next replay
+            return static_outputs.clone()
+
 
 class SegmentationModel(LazyModel):
     """
@@ -185,6 +456,60 @@ class SegmentationModel(LazyModel):
                 return SegmentationModel.from_onnx(model)
         return SegmentationModel.from_pyannote(model, use_hf_token)
 
+    def to_onnx(
+        self,
+        path: Union[str, Path],
+        num_samples: int,
+        num_channels: int = 1,
+        input_name: str = "waveform",
+        output_name: str = "segmentation",
+    ) -> "SegmentationModel":
+        """
+        Export a pytorch segmentation model to ONNX for a fixed chunk size.
+        Only the batch dimension is kept dynamic.
+        ONNX models are returned as is.
+
+        Parameters
+        ----------
+        path: str | Path
+            Path of the exported ONNX file.
+        num_samples: int
+            Number of samples per chunk.
+        num_channels: int
+            Number of audio channels. Defaults to 1.
+        input_name: str
+            Name of the input of the ONNX graph. Defaults to "waveform".
+        output_name: str
+            Name of the output of the ONNX graph. Defaults to "segmentation".
+
+        Returns
+        -------
+        wrapper: SegmentationModel
+            The exported model loaded with ONNX runtime.
+        """
+        self.load()
+        if isinstance(self.model, ONNXModel):
+            return self
+        assert IS_ONNX_AVAILABLE, "No ONNX installation found"
+        # Export a copy so the original model keeps its device and mode
+        model = copy.deepcopy(self.model).eval().cpu()
+        export_kwargs = {}
+        # Newer torch defaults to the dynamo exporter, which ignores
+        # `dynamic_axes` and requires onnxscript
+        if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+            export_kwargs["dynamo"] = False
+        with torch.no_grad():
+            torch.onnx.export(
+                model,
+                torch.zeros(1, num_channels, num_samples),
+                str(path),
+                input_names=[input_name],
+                output_names=[output_name],
+                dynamic_axes={input_name: {0: "batch"}, output_name: {0: "batch"}},
+                **export_kwargs,
+            )
+        return SegmentationModel.from_onnx(path, input_name, output_name)
+
     def __call__(self, waveform: torch.Tensor) -> torch.Tensor:
         """
         Call the forward pass of the segmentation model.
@@ -1,6 +1,6 @@
 import base64
 import time
-from typing import Optional, Text, Union
+from typing import Optional, Text, Union, Sequence
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -66,6 +66,45 @@ def decode_audio(data: Text) -> np.ndarray:
     return samples.reshape(1, -1)
 
 
+def try_contiguous_batch(
+    waveforms: Sequence[SlidingWindowFeature],
+) -> Optional[np.ndarray]:
+    """Batch audio chunks without copying if they are views of the same buffer.
+
+    This is the case when chunks are slices of a longer signal
+    taken at a constant offset from one another.
+
+    Parameters
+    ----------
+    waveforms: Sequence[SlidingWindowFeature], shapes (samples, channels)
+        Audio chunks to batch.
+
+    Returns
+    -------
+    batch: Optional[np.ndarray], shape (batch, samples, channels)
+        A strided view over the shared buffer, or None if chunks don't share one.
+    """
+    first = waveforms[0].data
+    if first.base is None or min(first.strides) < 0:
+        return None
+    for waveform in waveforms:
+        data = waveform.data
+        same_layout = data.shape == first.shape and data.strides == first.strides
+        if data.base is not first.base or data.dtype != first.dtype or not same_layout:
+            return None
+    # Chunks must be evenly spaced in memory to be described by a single stride
+    addresses = [w.data.__array_interface__["data"][0] for w in waveforms]
+    offsets = np.diff(addresses)
+    offset = int(offsets[0]) if len(offsets) > 0 else 0
+    if offset < 0 or offset % first.itemsize != 0 or np.any(offsets != offset):
+        return None
+    return np.lib.stride_tricks.as_strided(
+        first,
+        shape=(len(waveforms), *first.shape),
+        strides=(offset, *first.strides),
+    )
+
+
 def get_padding_left(stream_duration: float, chunk_duration: float) -> float:
     if stream_duration < chunk_duration:
         return chunk_duration - stream_duration